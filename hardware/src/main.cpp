@@ -1,6 +1,7 @@
 #include <Arduino.h>
 #include <WiFi.h>
 #include <PubSubClient.h>
+#include <ArduinoJson.h>
 
 #include <Adafruit_MPU6050.h>
 #include <Adafruit_Sensor.h>
@@ -10,6 +11,11 @@
 #include "secrets.h"
 
 #define DEBUG true
+// Payload format - must match a decoder in python/protocol.py
+#define PAYLOAD_JSON 0
+#define PAYLOAD_MSGPACK 1
+#define PAYLOAD_BINARY 2
+#define PAYLOAD_FORMAT PAYLOAD_BINARY
 #define FLAME_PIN 12 // flame sensor - digital
 #define GAS_PIN 34   // MQ gas - analog
 #define DHT_PIN 33   // DHT22 sensor pin
@@ -26,6 +32,22 @@ WiFiClient espClient;
 PubSubClient client(espClient);
 long lastMsg = 0;
 
+// Binary payload layout, little-endian like the ESP32 itself
+// Python: BINARY_STRUCT = struct.Struct("<B7hBHhHH")
+#define BINARY_MAGIC 0x01
+struct __attribute__((packed)) SensorPacket
+{
+  uint8_t magic;
+  int16_t acceleration_x, acceleration_y, acceleration_z;
+  int16_t gyro_x, gyro_y, gyro_z;
+  int16_t temperature;
+  uint8_t flame_status;
+  uint16_t gas_level;
+  int16_t temperature_out; // hundredths of °C
+  uint16_t humidity_out;   // hundredths of %
+  uint16_t motor_adc;
+};
+
 // --- MPU6050 Variables ---
 Adafruit_MPU6050 mpu;
 int acceleration_x, acceleration_y, acceleration_z;
@@ -281,6 +303,59 @@ void loop()
     get_dht_data();
     get_motor_current_data();
 
+#if PAYLOAD_FORMAT == PAYLOAD_BINARY
+    SensorPacket packet;
+    packet.magic = BINARY_MAGIC;
+    packet.acceleration_x = acceleration_x;
+    packet.acceleration_y = acceleration_y;
+    packet.acceleration_z = acceleration_z;
+    packet.gyro_x = gyro_x;
+    packet.gyro_y = gyro_y;
+    packet.gyro_z = gyro_z;
+    packet.temperature = temperature;
+    packet.flame_status = flame_status;
+    packet.gas_level = gas_level;
+    packet.temperature_out = lroundf(dht_temperature * 100);
+    packet.humidity_out = lroundf(dht_humidity * 100);
+    packet.motor_adc = motor_adc_value;
+
+    if (DEBUG)
+    {
+      Serial.print("Sending binary packet (");
+      Serial.print(sizeof(packet));
+      Serial.println(" bytes)");
+    }
+
+    client.publish(topic, (const uint8_t *)&packet, sizeof(packet));
+#elif PAYLOAD_FORMAT == PAYLOAD_MSGPACK
+    // Short keys keep the message small - see python/protocol.py
+    JsonDocument doc;
+    doc["ax"] = acceleration_x;
+    doc["ay"] = acceleration_y;
+    doc["az"] = acceleration_z;
+    doc["gx"] = gyro_x;
+    doc["gy"] = gyro_y;
+    doc["gz"] = gyro_z;
+    doc["t"] = temperature;
+    doc["f"] = flame_status;
+    doc["g"] = gas_level;
+    // Round to 2 decimals like the JSON "%.2f" format
+    doc["to"] = roundf(dht_temperature * 100) / 100.0;
+    doc["ho"] = roundf(dht_humidity * 100) / 100.0;
+    doc["m"] = motor_adc_value;
+
+    uint8_t msg[256];
+    size_t msg_len = serializeMsgPack(doc, msg, sizeof(msg));
+
+    if (DEBUG)
+    {
+      Serial.print("Sending MessagePack (");
+      Serial.print(msg_len);
+      Serial.println(" bytes)");
+    }
+
+    client.publish(topic, msg, msg_len);
+#else
     char msg[256];
     snprintf(msg, 256,
              "{\"acceleration_x\":%d,\"acceleration_y\":%d,\"acceleration_z\":%d,"
@@ -308,5 +383,6 @@ void loop()
     }
 
     client.publish(topic, msg);
+#endif
   }
 }
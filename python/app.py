@@ -1,13 +1,19 @@
 import streamlit as st
-import pandas as pd
+import numpy as np
 import paho.mqtt.client as mqtt
 from paho.mqtt.enums import CallbackAPIVersion
 from dotenv import load_dotenv
+import functools
+import math
 import os
-import json
+import queue
+import threading
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Optional, Tuple, Union
 import logging
+import msgspec
+
+from protocol import BINARY_FIELDS, BINARY_MAGIC, WIRE_KEYS, unpack_binary
 
 # --- LOGGING SETUP ---
 logging.basicConfig(
@@ -28,8 +34,13 @@ class AppConfig:
     PORT: int = int(os.getenv("MQTT_PORT", 1883))
     TOPIC: str = os.getenv("MQTT_TOPIC", "sensor/+")
     KEEPALIVE: int = int(os.getenv("MQTT_KEEPALIVE", 60))
+    # Min. 3 próbki - delty potrzebują 2 wierszy, wykresy więcej niż 2 punktów
+    HISTORY_SIZE: int = max(3, int(os.getenv("HISTORY_SIZE", 100)))
     PAGE_TITLE: str = "Industrial IoT Monitor"
     PAGE_ICON: str = "🏭"
+    COALESCE_WINDOW: float = 0.1  # max. czas zbierania serii wiadomości [s]
+    INGEST_BATCH: int = 256  # max. liczba wiadomości przetwarzanych naraz
+    INBOX_SIZE: int = 10_000  # max. liczba wiadomości czekających na ingest
 
 
 # --- STREAMLIT PAGE SETUP ---
@@ -42,20 +53,175 @@ st.set_page_config(
 
 
 # --- DATA STRUCTURES ---
+Reading = Optional[Union[int, float]]
+
+
+# Typowany payload; pola brakujące w wiadomości zostają None.
+# Pola w kolejności BINARY_FIELDS (payload binarny jest dekodowany pozycyjnie),
+# klucze MessagePack skrócone wg WIRE_KEYS. Same liczby, więc poza GC (gc=False)
+SensorMsg = msgspec.defstruct(
+    "SensorMsg",
+    [(name, Reading, None) for name in BINARY_FIELDS],
+    rename=WIRE_KEYS,
+    gc=False,
+)
+
+SENSOR_FIELDS: Tuple[str, ...] = SensorMsg.__struct_fields__
+# Bit obecności pola w DeviceData.present_mask
+FIELD_BIT: Dict[str, int] = {name: 1 << i for i, name in enumerate(SENSOR_FIELDS)}
+FIELD_BITS: Tuple[Tuple[str, int], ...] = tuple(FIELD_BIT.items())
+FLAME_BIT: int = FIELD_BIT["flame_status"]
+MOTION_BIT: int = FIELD_BIT["acceleration_x"]
+
+# Ten sam układ pól, ale z pełnymi nazwami kluczy (JSON ze starszego firmware)
+LegacySensorMsg = msgspec.defstruct(
+    "LegacySensorMsg", [(name, Reading, None) for name in SENSOR_FIELDS], gc=False
+)
+
+
+class RingBuffer:
+    """
+    Fixed-capacity float32 ring buffer of sensor rows, stored column-wise.
+
+    buf has one row per field and one column per sample, so every field's
+    history is a contiguous array. All fields share a single write cursor.
+    Missing readings are stored as NaN.
+    """
+
+    __slots__ = ("buf", "cap", "n", "head")
+
+    def __init__(self, capacity: int, width: int):
+        self.buf = np.full((width, capacity), np.nan, dtype=np.float32)
+        self.cap = capacity
+        self.n = 0
+        self.head = 0
+
+    def __len__(self) -> int:
+        return self.n
+
+    def append(self, row: Tuple[Reading, ...]) -> None:
+        head = self.head
+        # None w krotce numpy zapisuje jako NaN
+        self.buf[:, head] = row
+        head += 1
+        self.head = 0 if head == self.cap else head
+        if self.n < self.cap:
+            self.n += 1
+
+    def values(self) -> np.ndarray:
+        """Returns (width, n) values oldest first (a view until it wraps)."""
+        if self.n < self.cap:
+            return self.buf[:, : self.n]
+        return np.concatenate((self.buf[:, self.head :], self.buf[:, : self.head]), 1)
+
+    def last_delta(self) -> np.ndarray:
+        """Returns newest minus previous row for every field (NaN if unknown)."""
+        if self.n < 2:
+            return np.full(self.buf.shape[0], np.nan)
+        head = self.head
+        # float64 przed odejmowaniem, żeby zaokrąglenie nie pokazywało szumu float32
+        cur = self.buf[:, head - 1].astype(np.float64)
+        return cur - self.buf[:, head - 2]
+
+    def copy(self) -> "RingBuffer":
+        # __new__ bez __init__ - nie alokujemy bufora, który i tak nadpiszemy
+        rb = RingBuffer.__new__(RingBuffer)
+        rb.buf, rb.cap = self.buf.copy(), self.cap
+        rb.n, rb.head = self.n, self.head
+        return rb
+
+
 class DeviceData:
+    __slots__ = (
+        "name",
+        "max_history",
+        "history",
+        "latest",
+        "present_mask",
+        "seen_mask",
+        "last_update_ns",
+        "version",
+    )
+
     def __init__(self, name: str):
         self.name = name
-        self.history: List[Dict[str, Any]] = []
-        self.latest: Dict[str, Any] = {}
-        self.previous: Dict[str, Any] = {}
-        self.last_update: float = time.time()
-        self.max_history: int = 100
+        self.max_history: int = AppConfig.HISTORY_SIZE
+        # Historia kolumnowa: wiersz na pole SENSOR_FIELDS, wspólny kursor
+        self.history = RingBuffer(self.max_history, len(SENSOR_FIELDS))
+        self.latest: SensorMsg = SensorMsg()
+        # Bity pól obecnych w latest / kiedykolwiek widzianych (patrz FIELD_BIT)
+        self.present_mask: int = 0
+        self.seen_mask: int = 0
+        # Zegar monotoniczny [ns] - tani odczyt, bez alokacji float
+        self.last_update_ns: int = time.monotonic_ns()
+        # Licznik zapisów - UI pomija render, jeśli się nie zmienił
+        self.version: int = 0
+
+    def ingest(self, payload: SensorMsg, now_ns: int) -> None:
+        """Stores a decoded payload as the latest reading and in the history."""
+        self.latest = payload
+        row = msgspec.structs.astuple(payload)
+        mask = 0
+        for (_, bit), value in zip(FIELD_BITS, row):
+            if value is not None:
+                mask |= bit
+        self.history.append(row)
+        self.present_mask = mask
+        self.seen_mask |= mask
+        self.last_update_ns = now_ns
+        self.version += 1
+
+    def history_columns(self) -> Dict[str, np.ndarray]:
+        """Returns the history of every field seen so far, keyed by name."""
+        rows = self.history.values()
+        return {
+            key: rows[i]
+            for i, (key, bit) in enumerate(FIELD_BITS)
+            if self.seen_mask & bit
+        }
+
+    def snapshot(self) -> "DeviceData":
+        """Returns a copy that can be rendered while new messages arrive."""
+        # __new__ bez __init__ - pomijamy alokację pustej historii
+        snap = DeviceData.__new__(DeviceData)
+        snap.name = self.name
+        snap.max_history = self.max_history
+        snap.history = self.history.copy()
+        snap.latest = self.latest
+        snap.present_mask = self.present_mask
+        snap.seen_mask = self.seen_mask
+        snap.last_update_ns = self.last_update_ns
+        snap.version = self.version
+        return snap
 
 
 class MQTTState:
+    __slots__ = (
+        "connected",
+        "devices",
+        "lock",
+        "cond",
+        "seq",
+        "inbox",
+        "dropped",
+    )
+
     def __init__(self):
         self.connected: bool = False
         self.devices: Dict[str, DeviceData] = {}
+        # Chroni devices przed równoczesnym zapisem (wątek paho) i odczytem (UI)
+        self.lock = threading.Lock()
+        # Budzi pętle renderujące wszystkich sesji, gdy przybędzie danych
+        self.cond = threading.Condition(self.lock)
+        # Licznik zapisanych wiadomości - każda sesja pamięta swój ostatni
+        self.seq: int = 0
+        # Surowe wiadomości (topic, payload) z wątku paho do wątku ingest.
+        # Ograniczona, żeby zaległości nie zjadały pamięci bez końca
+        self.inbox: "queue.Queue[Tuple[str, bytes]]" = queue.Queue(
+            maxsize=AppConfig.INBOX_SIZE
+        )
+        # Wiadomości odrzucone przy pełnej kolejce (pisze tylko wątek paho)
+        self.dropped: int = 0
 
 
 @st.cache_resource
@@ -63,6 +229,49 @@ def get_mqtt_state() -> MQTTState:
     return MQTTState()
 
 
+# --- PAYLOAD DECODING ---
+MSGPACK_DECODER = msgspec.msgpack.Decoder(SensorMsg)
+JSON_DECODER = msgspec.json.Decoder(LegacySensorMsg)
+_json_fallback_warned: bool = False
+EMPTY_MSG = SensorMsg()
+
+
+def decode_payload(raw: bytes) -> SensorMsg:
+    """
+    Decodes a sensor payload straight into a SensorMsg.
+
+    The firmware publishes a fixed binary struct (first byte BINARY_MAGIC) or
+    MessagePack maps with short keys (first byte >= 0x80). Anything else is
+    treated as JSON with full key names from older firmware, with a one-time
+    warning.
+
+    Raises ValueError if no known sensor field was decoded (e.g. MessagePack
+    with long keys), so such payloads are never stored.
+    """
+    global _json_fallback_warned
+    if raw and raw[0] == BINARY_MAGIC:
+        # Pozycyjnie - SensorMsg ma pola w kolejności BINARY_FIELDS
+        return SensorMsg(*unpack_binary(raw))
+    if raw and raw[0] >= 0x80:
+        msg = MSGPACK_DECODER.decode(raw)
+    else:
+        if not _json_fallback_warned:
+            _json_fallback_warned = True
+            logger.warning("Received JSON payload, falling back to the JSON decoder")
+        msg = SensorMsg(*msgspec.structs.astuple(JSON_DECODER.decode(raw)))
+    # msgspec pomija nieznane klucze - pusty wynik to zły format, nie odczyt
+    if msg == EMPTY_MSG:
+        raise ValueError("Payload has no known sensor fields")
+    return msg
+
+
+@functools.lru_cache(maxsize=64)
+def device_name_from_topic(topic: str) -> str:
+    """Extracts the device name from a topic, e.g. sensor/jadwiga -> jadwiga."""
+    _, sep, name = topic.rpartition("/")
+    return name if sep and name else "Unknown"
+
+
 # --- MQTT CALLBACKS ---
 def on_connect(
     client: mqtt.Client, userdata: Any, flags: Dict, rc: int, properties: Any = None
@@ -80,10 +289,10 @@ def on_connect(
     if rc == 0:
         userdata.connected = True
         client.subscribe(AppConfig.TOPIC)
-        logger.info(f"Connected to MQTT Broker: {AppConfig.BROKER}")
+        logger.info("Connected to MQTT Broker: %s", AppConfig.BROKER)
     else:
         userdata.connected = False
-        logger.error(f"Failed to connect, return code {rc}")
+        logger.error("Failed to connect, return code %s", rc)
 
 
 def on_disconnect(
@@ -100,45 +309,76 @@ def on_message(client: mqtt.Client, userdata: Any, msg: mqtt.MQTTMessage) -> Non
     """
     Callback function triggered when a message is received.
 
+    Only queues the raw message; decoding and storing happen in ingest_worker
+    so the paho network thread is never blocked by the UI. When the inbox is
+    full the message is dropped and counted.
+
     Args:
         client: The MQTT client instance.
-        userdata: User data (contains the Config object).
+        userdata: User data (contains the MQTTState object).
         msg: The actual message object containing topic and payload.
     """
     try:
-        # 1. Wyciągnij nazwę urządzenia z tematu
-        # np. sensor/jadwiga -> jadwiga
-        topic_parts = msg.topic.split("/")
-        device_name = topic_parts[-1] if len(topic_parts) > 1 else "Unknown"
-
-        # 2. Parsuj JSON
-        payload = json.loads(msg.payload.decode())
+        userdata.inbox.put_nowait((msg.topic, msg.payload))
+    except queue.Full:
+        userdata.dropped += 1
+        # Logujemy pierwszy i co tysięczny zrzut, żeby nie zalać logu
+        if userdata.dropped % 1000 == 1:
+            logger.warning("Inbox full, dropped %d messages so far", userdata.dropped)
 
-        # 3. Jeśli to nowe urządzenie, dodaj je do słownika devices
-        if device_name not in userdata.devices:
-            # Tworzymy nową instancję DeviceData
-            userdata.devices[device_name] = DeviceData(device_name)
-            logger.info(f"New Device Detected: {device_name}")
 
-        # 4. Pobierz obiekt konkretnego urządzenia
-        device = userdata.devices[device_name]
-
-        # 5. Zapisz dane W KONKRETNYM URZĄDZENIU (a nie w userdata.latest!)
-        if device.latest:
-            device.previous = device.latest.copy()
+# --- INGEST ---
+def store_payload(
+    state: MQTTState, device_name: str, payload: SensorMsg, now_ns: int
+) -> None:
+    """Stores a decoded payload in its device. Caller must hold state.lock."""
+    device = state.devices.get(device_name)
+    if device is None:
+        # Nowe urządzenie - dodaj je do słownika devices
+        device = state.devices[device_name] = DeviceData(device_name)
+        logger.info("New Device Detected: %s", device_name)
 
-        device.latest = payload
-        device.history.append(payload)
-        device.last_update = time.time()
+    device.ingest(payload, now_ns)
+    state.seq += 1
 
-        # Limit historii
-        if len(device.history) > device.max_history:
-            device.history.pop(0)
 
-    except json.JSONDecodeError:
-        logger.error(f"Invalid JSON received: {msg.payload}")
-    except Exception as e:
-        logger.error(f"Error processing message: {e}")
+def ingest_worker(state: MQTTState) -> None:
+    """
+    Drains the inbox in batches: decodes up to AppConfig.INGEST_BATCH
+    messages, stores them under a single lock acquisition and wakes the UI.
+    """
+    inbox = state.inbox
+    batch_size = AppConfig.INGEST_BATCH
+    while True:
+        batch = [inbox.get()]
+        try:
+            while len(batch) < batch_size:
+                batch.append(inbox.get_nowait())
+        except queue.Empty:
+            pass
+
+        decoded = []
+        for topic, raw in batch:
+            try:
+                # np. sensor/jadwiga -> jadwiga (tematy się powtarzają, więc cache)
+                decoded.append((device_name_from_topic(topic), decode_payload(raw)))
+            except ValueError:
+                logger.error("Invalid payload received: %r", raw)
+            except Exception as e:
+                logger.error("Error processing message: %s", e)
+
+        if not decoded:
+            continue
+
+        # Jeden odczyt zegara na całą paczkę wiadomości
+        now_ns = time.monotonic_ns()
+        with state.lock:
+            for device_name, payload in decoded:
+                try:
+                    store_payload(state, device_name, payload, now_ns)
+                except Exception as e:
+                    logger.error("Error processing message: %s", e)
+            state.cond.notify_all()
 
 
 # --- MQTT CLIENT FACTORY ---
@@ -152,271 +392,195 @@ def start_mqtt_client() -> Optional[mqtt.Client]:
     client.on_disconnect = on_disconnect
     client.on_message = on_message
 
+    threading.Thread(
+        target=ingest_worker, args=(state,), name="mqtt-ingest", daemon=True
+    ).start()
+
     try:
         client.connect(AppConfig.BROKER, AppConfig.PORT, AppConfig.KEEPALIVE)
         client.loop_start()
         return client
     except Exception as e:
-        logger.critical(f"Could not connect to broker: {e}")
+        logger.critical("Could not connect to broker: %s", e)
         return None
 
 
+# --- METRICS ---
+# (klucz, bit obecności, etykieta, jednostka, delta_color, opis)
+MetricSpec = Tuple[str, int, str, str, str, str]
+
+
+def metric_specs(*specs: Tuple[str, str, str, str, str]) -> Tuple[MetricSpec, ...]:
+    """Adds the presence bit of each field to (key, label, unit, color, help)."""
+    return tuple((key, FIELD_BIT[key], *rest) for key, *rest in specs)
+
+
+ENV_METRICS: Tuple[MetricSpec, ...] = metric_specs(
+    ("temperature", "Temp (In)", "°C", "normal", "Ambient temperature reading"),
+    ("temperature_out", "Temp (Out)", "°C", "normal", "Outside temperature reading"),
+    ("humidity_out", "Humidity", "%", "normal", "Outside humidity reading"),
+    ("gas_level", "Gas Sensor", "", "inverse", "Gas concentration level (ppm)"),
+    ("motor_adc", "Motor ADC", "", "normal", "Motor flow ADC value"),
+)
+MOTION_METRICS: Tuple[MetricSpec, ...] = metric_specs(
+    ("acceleration_x", "Acc X", "", "normal", "Acceleration X-axis"),
+    ("acceleration_y", "Acc Y", "", "normal", "Acceleration Y-axis"),
+    ("acceleration_z", "Acc Z", "", "normal", "Acceleration Z-axis"),
+    ("gyro_x", "Gyro X", "", "normal", "Gyroscope X-axis"),
+    ("gyro_y", "Gyro Y", "", "normal", "Gyroscope Y-axis"),
+    ("gyro_z", "Gyro Z", "", "normal", "Gyroscope Z-axis"),
+)
+
+
 # --- UI COMPONENTS ---
-def render_sidebar(state: MQTTState):
-    """Renders the sidebar configuration and status."""
+def render_sidebar() -> Tuple[Any, Any]:
+    """Renders the static sidebar once and returns the status placeholders."""
     with st.sidebar:
         st.header(f"{AppConfig.PAGE_ICON} {AppConfig.PAGE_TITLE}")
 
         st.divider()
 
         st.subheader("🌐 Network Status")
-
-        # Connection Status Indicator
-        if state.connected:
-            st.success(f"🟢 Connected: {AppConfig.BROKER}")
-        else:
-            st.error("🔴 Disconnected")
+        status_slot = st.empty()
 
         st.divider()
         st.subheader("⚙️ Configuration")
-        st.info(f"Devices connected: {len(state.devices)}")
+        devices_slot = st.empty()
+        st.caption(f"History: last {AppConfig.HISTORY_SIZE} samples per device")
         st.badge(f"Topic: `{AppConfig.TOPIC}`", color="blue", icon="📓")
         st.divider()
+    return status_slot, devices_slot
 
 
-def calculate_delta(current: float, previous: float) -> Optional[float]:
-    """Helper to calculate metric delta."""
-    if previous is None:
-        return None
-    return round(current - previous, 2)
+def render_sidebar_status(
+    slots: Tuple[Any, Any], connected: bool, device_count: int
+) -> None:
+    """Updates the connection indicator and device count in the sidebar."""
+    status_slot, devices_slot = slots
+    # Connection Status Indicator
+    if connected:
+        status_slot.success(f"🟢 Connected: {AppConfig.BROKER}")
+    else:
+        status_slot.error("🔴 Disconnected")
+    devices_slot.info(f"Devices connected: {device_count}")
+
+
+def calculate_deltas(
+    current: SensorMsg, history: RingBuffer, present_mask: int
+) -> Dict[str, Reading]:
+    """Calculates metric deltas for every present field from the last two rows."""
+    diffs = np.round(history.last_delta(), 2).tolist()
+    values = msgspec.structs.astuple(current)
+    deltas: Dict[str, Reading] = {}
+    for (key, bit), value, d in zip(FIELD_BITS, values, diffs):
+        if not present_mask & bit:
+            continue
+        # Brak poprzedniej wartości jest w buforze zapisany jako NaN
+        if math.isnan(d):
+            deltas[key] = None
+        elif isinstance(value, int) and d.is_integer():
+            # Całkowite delty pól int bez ".0"; ułamkowych nigdy nie obcinamy
+            deltas[key] = int(d)
+        else:
+            deltas[key] = d
+    return deltas
 
 
-def render_device_tab(device: DeviceData):
-    data = device.latest
-    prev = device.previous
+def format_metric_value(key: str, value: Any, unit: str) -> str:
+    """Formats a metric value with its unit (and status for the gas sensor)."""
+    if key == "gas_level":
+        status = (
+            "⚠️ DANGER" if value > 1000 else "⚠️ WARNING" if value > 700 else "✅ SAFE"
+        )
+        return f"{value} ({status})"
+    return f"{value} {unit}" if unit else f"{value}"
+
 
-    st.caption(
-        f"Last update: {time.strftime('%H:%M:%S', time.localtime(device.last_update))}"
+def render_metric(
+    col: Any,
+    spec: MetricSpec,
+    data: SensorMsg,
+    present_mask: int,
+    deltas: Dict[str, Reading],
+    hist: Dict[str, np.ndarray],
+) -> None:
+    """Renders a single KPI metric described by a METRICS spec, if present."""
+    key, bit, label, unit, delta_color, help_text = spec
+    if not present_mask & bit:
+        return
+    val = getattr(data, key)
+    col.metric(
+        label,
+        format_metric_value(key, val, unit),
+        deltas[key],
+        delta_color=delta_color,
+        help=help_text,
+        border=True,
+        chart_data=hist.get(key),
     )
 
+
+def render_last_update(slot: Any, last_update_ns: int) -> None:
+    """Shows how long ago the device last reported."""
+    elapsed = (time.monotonic_ns() - last_update_ns) / 1e9
+    slot.caption(f"Last update: {elapsed:.1f}s ago")
+
+
+def render_device_tab(device: DeviceData):
+    data = device.latest
+    mask = device.present_mask
+    deltas = calculate_deltas(data, device.history, mask)
+    # Historia jako tablice numpy - wykresy dostają je bez budowania DataFrame
+    hist = device.history_columns()
+
     # --- KPI METRICS ---
     # Używamy dynamicznego układu - wyświetlamy tylko to, co jest w danych
 
     # Row 1: Environment & Status
-    c1, c2, c3 = st.columns(3)
-    c4, c5, c6 = st.columns(3)
-
-    with c1:
-        if "temperature" in data:
-            val = data["temperature"]
-            p_val = prev.get("temperature") if prev else None
-            st.metric(
-                label="Temp (In)",
-                value=f"{val} °C",
-                delta=(calculate_delta(val, p_val)),
-                help="Ambient temperature reading",
-                border=True,
-                chart_data=(
-                    pd.DataFrame(device.history)["temperature"]
-                    if device.history
-                    else None
-                ),
-            )
-
-    with c2:
-        if "temperature_out" in data:
-            val = data["temperature_out"]
-            p_val = prev.get("temperature_out") if prev else None
-            st.metric(
-                "Temp (Out)",
-                f"{val} °C",
-                calculate_delta(val, p_val),
-                border=True,
-                help="Outside temperature reading",
-                chart_data=(
-                    pd.DataFrame(device.history)["temperature_out"]
-                    if device.history
-                    else None
-                ),
-            )
-
-    with c3:
-        if "humidity_out" in data:
-            val = data["humidity_out"]
-            p_val = prev.get("humidity_out") if prev else None
-            st.metric(
-                "Humidity",
-                f"{val} %",
-                calculate_delta(val, p_val),
-                border=True,
-                help="Outside humidity reading",
-                chart_data=(
-                    pd.DataFrame(device.history)["humidity_out"]
-                    if device.history
-                    else None
-                ),
-            )
-
-    with c4:
-        if "gas_level" in data:
-            val = data["gas_level"]
-            p_val = prev.get("gas_level") if prev else None
-            status = (
-                "⚠️ DANGER" if val > 1000 else "⚠️ WARNING" if val > 700 else "✅ SAFE"
-            )
-            st.metric(
-                "Gas Sensor",
-                f"{val} ({status})",
-                calculate_delta(val, p_val),
-                delta_color="inverse",
-                border=True,
-                help="Gas concentration level (ppm)",
-                chart_data=(
-                    pd.DataFrame(device.history)["gas_level"]
-                    if device.history
-                    else None
-                ),
-            )
-
-    with c5:
-        if "motor_adc" in data:
-            val = data["motor_adc"]
-            p_val = prev.get("motor_adc") if prev else None
-            st.metric(
-                "Motor ADC",
-                f"{val}",
-                calculate_delta(val, p_val),
-                border=True,
-                help="Motor flow ADC value",
-                chart_data=(
-                    pd.DataFrame(device.history)["motor_adc"]
-                    if device.history
-                    else None
-                ),
-            )
-
-    with c6:
-        if "flame_status" in data:
-            val = data["flame_status"]
-            # 0 zazwyczaj oznacza wykrycie płomienia w tanich czujnikach cyfrowych, ale zależy od konfiguracji
-            label = "🔥 FIRE!" if val == 1 else "✅ Safe"
-            st.metric("Flame", label, border=True, help="Flame detection status")
+    cols = st.columns(3) + st.columns(3)
+    for col, spec in zip(cols, ENV_METRICS):
+        render_metric(col, spec, data, mask, deltas, hist)
+
+    if mask & FLAME_BIT:
+        # 0 zazwyczaj oznacza wykrycie płomienia w tanich czujnikach cyfrowych, ale zależy od konfiguracji
+        label = "🔥 FIRE!" if data.flame_status == 1 else "✅ Safe"
+        cols[5].metric("Flame", label, border=True, help="Flame detection status")
 
     # Row 2: Mechanics (Accel/Gyro)
     # Wyświetlamy tylko jeśli są dane z akcelerometru
-    if "acceleration_x" in data:
+    if mask & MOTION_BIT:
         st.markdown("##### ⚙️ Motion Data")
-        m1, m2, m3, m4, m5, m6 = st.columns(6)
-
-        acc_x = data.get("acceleration_x")
-        acc_x_prev = prev.get("acceleration_x") if prev else None
-        m1.metric(
-            "Acc X",
-            acc_x,
-            border=True,
-            help="Acceleration X-axis",
-            delta=calculate_delta(acc_x, acc_x_prev),
-            chart_data=(
-                pd.DataFrame(device.history)["acceleration_x"]
-                if device.history
-                else None
-            ),
-        )
-        acc_y = data.get("acceleration_y")
-        acc_y_prev = prev.get("acceleration_y") if prev else None
-        m2.metric(
-            "Acc Y",
-            acc_y,
-            border=True,
-            help="Acceleration Y-axis",
-            delta=calculate_delta(acc_y, acc_y_prev),
-            chart_data=(
-                pd.DataFrame(device.history)["acceleration_y"]
-                if device.history
-                else None
-            ),
-        )
-        acc_z = data.get("acceleration_z")
-        acc_z_prev = prev.get("acceleration_z") if prev else None
-        m3.metric(
-            "Acc Z",
-            acc_z,
-            border=True,
-            help="Acceleration Z-axis",
-            delta=calculate_delta(acc_z, acc_z_prev),
-            chart_data=(
-                pd.DataFrame(device.history)["acceleration_z"]
-                if device.history
-                else None
-            ),
-        )
-        gyro_x = data.get("gyro_x")
-        gyro_x_prev = prev.get("gyro_x") if prev else None
-        m4.metric(
-            "Gyro X",
-            gyro_x,
-            border=True,
-            help="Gyroscope X-axis",
-            delta=calculate_delta(gyro_x, gyro_x_prev),
-            chart_data=(
-                pd.DataFrame(device.history)["gyro_x"] if device.history else None
-            ),
-        )
-        gyro_y = data.get("gyro_y")
-        gyro_y_prev = prev.get("gyro_y") if prev else None
-        m5.metric(
-            "Gyro Y",
-            gyro_y,
-            border=True,
-            help="Gyroscope Y-axis",
-            delta=calculate_delta(gyro_y, gyro_y_prev),
-            chart_data=(
-                pd.DataFrame(device.history)["gyro_y"] if device.history else None
-            ),
-        )
-        gyro_z = data.get("gyro_z")
-        gyro_z_prev = prev.get("gyro_z") if prev else None
-        m6.metric(
-            "Gyro Z",
-            gyro_z,
-            border=True,
-            help="Gyroscope Z-axis",
-            delta=calculate_delta(gyro_z, gyro_z_prev),
-            chart_data=(
-                pd.DataFrame(device.history)["gyro_z"] if device.history else None
-            ),
-        )
+        for col, spec in zip(st.columns(6), MOTION_METRICS):
+            render_metric(col, spec, data, mask, deltas, hist)
 
     st.divider()
 
     # --- CHARTS ---
     if len(device.history) > 2:
-        df = pd.DataFrame(device.history)
-
         tab_env, tab_mot = st.tabs(["🌡️ Environment Charts", "⚙️ Mechanical Analysis"])
 
         with tab_env:
             # Wykres temperatur
-            cols_temp = [
-                c for c in ["temperature", "temperature_out"] if c in df.columns
-            ]
-            if cols_temp:
-                st.line_chart(df[cols_temp], height=250)
+            temps = {
+                c: hist[c] for c in ["temperature", "temperature_out"] if c in hist
+            }
+            if temps:
+                st.line_chart(temps, height=250)
 
             # Wykres gazu i wilgotności
             c_left, c_right = st.columns(2)
-            if "gas_level" in df.columns:
-                c_left.area_chart(df["gas_level"], color="#ffaa00", height=200)
-            if "humidity_out" in df.columns:
-                c_right.line_chart(df["humidity_out"], color="#00aaff", height=200)
+            if "gas_level" in hist:
+                c_left.area_chart(hist["gas_level"], color="#ffaa00", height=200)
+            if "humidity_out" in hist:
+                c_right.line_chart(hist["humidity_out"], color="#00aaff", height=200)
 
         with tab_mot:
-            cols_acc = [c for c in df.columns if "acceleration" in c]
-            if cols_acc:
-                st.line_chart(df[cols_acc], height=300)
-            cols_gyro = [c for c in df.columns if "gyro" in c]
-            if cols_gyro:
-                st.line_chart(df[cols_gyro], height=300)
+            acc = {c: v for c, v in hist.items() if "acceleration" in c}
+            if acc:
+                st.line_chart(acc, height=300)
+            gyro = {c: v for c, v in hist.items() if "gyro" in c}
+            if gyro:
+                st.line_chart(gyro, height=300)
 
 
 # --- MAIN LOOP ---
@@ -428,7 +592,9 @@ def main():
     state = get_mqtt_state()
 
     # 2. Render Sidebar
-    render_sidebar(state)
+    sidebar_slots = render_sidebar()
+    sidebar_key = (state.connected, len(state.devices))
+    render_sidebar_status(sidebar_slots, *sidebar_key)
 
     if client is None:
         st.error("🚨 Critical Error: MQTT Broker is unreachable. Please check Docker.")
@@ -437,27 +603,74 @@ def main():
     if not client:
         st.stop()
 
+    topic = AppConfig.TOPIC
+    coalesce_window = AppConfig.COALESCE_WINDOW
+
     # Dynamic Container
     main_container = st.empty()
+    # Układ (zakładki) budujemy tylko przy zmianie listy urządzeń
+    layout_key: Optional[Tuple[str, ...]] = None
+    device_slots: Dict[str, Tuple[Any, Any]] = {}
+    # Wersja danych urządzenia, którą ostatnio narysowano
+    rendered_versions: Dict[str, int] = {}
+    # Numer ostatniej wiadomości, którą ta sesja widziała (stan wspólny tylko czytamy)
+    last_seen = -1
 
     while True:
-        with main_container.container():
-            if not state.devices:
-                st.info(f"📡 Waiting for devices on `{AppConfig.TOPIC}`...")
-                st.write("Listening for: `sensor/jadwiga` or similar...")
-            else:
-                # Sortujemy nazwy, żeby kolejność zakładek nie skakała
-                device_names = sorted(list(state.devices.keys()))
-
-                # Tworzymy zakładki dla każdego urządzenia
-                # Np. Tab 1: "JADWIGA", Tab 2: "GARAZ"
-                tabs = st.tabs([f"📍 {name.upper()}" for name in device_names])
-
-                for i, name in enumerate(device_names):
-                    with tabs[i]:
-                        render_device_tab(state.devices[name])
-
-        time.sleep(0.5)
+        # Szybki snapshot pod lockiem, renderowanie już bez niego
+        with state.lock:
+            last_seen = state.seq
+            # Sortujemy nazwy, żeby kolejność zakładek nie skakała
+            device_names = tuple(sorted(state.devices))
+            if device_names != layout_key:
+                # Nowy układ zakładek - rysujemy wszystkie urządzenia od nowa
+                rendered_versions = {}
+            # Kopiujemy tylko urządzenia z nowymi danymi, reszcie wystarczy czas
+            update_ns = {name: d.last_update_ns for name, d in state.devices.items()}
+            changed = {
+                name: d.snapshot()
+                for name, d in state.devices.items()
+                if rendered_versions.get(name) != d.version
+            }
+
+        # Status w sidebarze wysyłamy tylko, gdy faktycznie się zmienił
+        if (state.connected, len(device_names)) != sidebar_key:
+            sidebar_key = (state.connected, len(device_names))
+            render_sidebar_status(sidebar_slots, *sidebar_key)
+
+        if device_names != layout_key:
+            layout_key = device_names
+            with main_container.container():
+                if not device_names:
+                    st.info(f"📡 Waiting for devices on `{topic}`...")
+                    st.write("Listening for: `sensor/jadwiga` or similar...")
+                    device_slots = {}
+                else:
+                    # Tworzymy zakładki dla każdego urządzenia
+                    # Np. Tab 1: "JADWIGA", Tab 2: "GARAZ"
+                    tabs = st.tabs([f"📍 {name.upper()}" for name in device_names])
+                    device_slots = {
+                        name: (tab.empty(), tab.empty())
+                        for name, tab in zip(device_names, tabs)
+                    }
+
+        # Odświeżamy tylko zawartość zakładek, i tylko gdy przyszły nowe dane
+        for name, (caption_slot, body_slot) in device_slots.items():
+            render_last_update(caption_slot, update_ns[name])
+            device = changed.get(name)
+            if device is not None:
+                rendered_versions[name] = device.version
+                with body_slot.container():
+                    render_device_tab(device)
+
+        # Czekamy na nowe dane zamiast odświeżać co stały interwał
+        with state.cond:
+            state.cond.wait_for(lambda: state.seq != last_seen, timeout=2.0)
+            # Ile wiadomości przyszło od ostatniej klatki tej sesji
+            burst = state.seq - last_seen
+        if burst > 1:
+            # Trwa seria wiadomości - zbieramy ją do jednej klatki
+            time.sleep(coalesce_window)
 
 
 if __name__ == "__main__":
@@ -1,11 +1,18 @@
 import os
-import json
 import sys
 from typing import Any, Dict
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 import paho.mqtt.client as mqtt
 from paho.mqtt.enums import CallbackAPIVersion
 from dotenv import load_dotenv
+import msgpack
+
+from protocol import BINARY_FIELDS, BINARY_MAGIC, LONG_KEYS, unpack_binary
 
 # Load environment variables from .env file
 load_dotenv()
@@ -29,6 +36,19 @@ class Config:
         return f"Config(broker={self.broker}, port={self.port}, topic={self.topic})"
 
 
+def decode_payload(raw: bytes) -> Dict[str, Any]:
+    """
+    Decodes a binary or MessagePack payload (short keys are expanded to full
+    names), or JSON sent by older firmware.
+    """
+    if raw and raw[0] == BINARY_MAGIC:
+        return dict(zip(BINARY_FIELDS, unpack_binary(raw)))
+    if raw and raw[0] >= 0x80:
+        data = msgpack.unpackb(raw, raw=False)
+        return {LONG_KEYS.get(k, k): v for k, v in data.items()}
+    return json_loads(raw)
+
+
 def on_connect(
     client: mqtt.Client, userdata: Any, flags: Dict, rc: int, properties: Any = None
 ) -> None:
@@ -61,13 +81,10 @@ def on_message(client: mqtt.Client, userdata: Any, msg: mqtt.MQTTMessage):
         msg: The actual message object containing topic and payload.
     """
     try:
-        # 1. Decode payload
-        payload_str = msg.payload.decode()
-
-        # 2. Parse JSON
-        data = json.loads(payload_str)
+        # 1. Decode payload straight from bytes (no intermediate str)
+        data = decode_payload(msg.payload)
 
-        # 3. specific display logic
+        # 2. specific display logic
         print("\n" + "=" * 40)
         print(f"📥 Received data from: {msg.topic}")
         print("-" * 40)
@@ -80,8 +97,8 @@ def on_message(client: mqtt.Client, userdata: Any, msg: mqtt.MQTTMessage):
         print(f"📳 Vibration   : {data.get('vibration', 0)} Hz")
         print("=" * 40)
 
-    except json.JSONDecodeError:
-        print(f"⚠️ Failed to decode JSON: {msg.payload}")
+    except ValueError:
+        print(f"⚠️ Failed to decode payload: {msg.payload}")
     except Exception as e:
         print(f"❌ Error processing message: {e}")
 
@@ -0,0 +1,43 @@
+"""
+Wire protocol shared by the dashboard (app.py) and the console logger (main.py).
+
+Must stay in sync with the payload built in hardware/src/main.cpp.
+"""
+
+import struct
+from typing import Dict, Tuple, Union
+
+# MessagePack payloads use short keys to keep messages small.
+# Long name (used everywhere in Python) -> key on the wire.
+WIRE_KEYS: Dict[str, str] = {
+    "acceleration_x": "ax",
+    "acceleration_y": "ay",
+    "acceleration_z": "az",
+    "gyro_x": "gx",
+    "gyro_y": "gy",
+    "gyro_z": "gz",
+    "temperature": "t",
+    "flame_status": "f",
+    "gas_level": "g",
+    "temperature_out": "to",
+    "humidity_out": "ho",
+    "motor_adc": "m",
+}
+
+# Key on the wire -> long name.
+LONG_KEYS: Dict[str, str] = {short: long for long, short in WIRE_KEYS.items()}
+
+# Binary payload: fixed little-endian layout, fields in WIRE_KEYS order,
+# prefixed with BINARY_MAGIC (distinct from JSON "{" and MessagePack maps).
+# DHT22 temperature and humidity are sent in hundredths.
+BINARY_MAGIC = 0x01
+BINARY_STRUCT = struct.Struct("<B7hBHhHH")
+BINARY_FIELDS: Tuple[str, ...] = tuple(WIRE_KEYS)
+
+
+def unpack_binary(raw: bytes) -> Tuple[Union[int, float], ...]:
+    """Unpacks a binary payload into values ordered like BINARY_FIELDS."""
+    if len(raw) != BINARY_STRUCT.size or raw[0] != BINARY_MAGIC:
+        raise ValueError(f"Not a binary sensor payload ({len(raw)} bytes)")
+    _, *values, temp_out, hum_out, motor = BINARY_STRUCT.unpack(raw)
+    return (*values, temp_out / 100, hum_out / 100, motor)